@@ -0,0 +1,107 @@
+"""
+Shared C source emitters and build stamps for the logo/image conversion scripts
+Used by compress_logo.py, png_to_logo.py, png_to_rgb565.py and embed_png.py
+Standard library only - NumPy pixel code lives in _pixels.py
+"""
+
+import contextlib
+import hashlib
+import mmap
+import os
+
+def file_sha256(path):
+    """SHA-256 hex digest of a file (zero-copy file_digest on Python 3.11+)"""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+        return hashlib.sha256(f.read()).hexdigest()
+
+def stamp_key(src_file, converter, target_size=None, backend=None):
+    """Key identifying one conversion: source hash + converter + size (+ image loader)"""
+    size = f"{target_size[0]}x{target_size[1]}" if target_size else "native"
+    key = f"{file_sha256(src_file)} {converter} {size}"
+    return f"{key} {backend}" if backend else key
+
+def _stamp_name(output_file, path):
+    """Path of a generated file as recorded in output_file's stamp"""
+    return os.path.relpath(path, os.path.dirname(os.path.abspath(output_file)))
+
+def is_up_to_date(output_file, key, extra_files=()):
+    """True if output_file (and extra_files) are unmodified since they were generated from key"""
+    try:
+        with open(output_file + '.stamp') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return False
+    # Line 1 is the input key, then '<sha256> <file>' per file as written - a
+    # checkout, hand edit or compress_logo.py run since then invalidates it
+    if not lines or lines[0] != key:
+        return False
+    hashes = dict(reversed(line.split(' ', 1)) for line in lines[1:] if ' ' in line)
+    for path in (output_file, *extra_files):
+        recorded = hashes.get(_stamp_name(output_file, path))
+        if recorded is None or not os.path.exists(path) or file_sha256(path) != recorded:
+            return False
+    return True
+
+def write_stamp(output_file, key, extra_files=()):
+    """Record key and the generated files' hashes so unchanged inputs can be skipped"""
+    with open(output_file + '.stamp', 'w') as f:
+        f.write(key + '\n')
+        for path in (output_file, *extra_files):
+            f.write(f"{file_sha256(path)} {_stamp_name(output_file, path)}\n")
+
+def write_bin(bin_file, blob):
+    """Write the raw image blob (same bytes as the C array) for direct flashing"""
+    with open(bin_file, 'wb') as f:
+        f.write(blob)
+
+def open_output(output_file, file=None):
+    """Open output_file for writing, or pass an already open file through"""
+    if file is not None:
+        return contextlib.nullcontext(file)
+    return open(output_file, 'w')
+
+def map_readonly(f):
+    """Map an open binary file read-only (zero-copy); empty files give b''"""
+    if os.fstat(f.fileno()).st_size == 0:
+        return contextlib.nullcontext(b'')  # mmap rejects empty files
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def hex_lines(data, per_line=16):
+    """Yield one line of C hex literals per per_line bytes of data"""
+    # Release the views when done so an mmap'd data buffer can be closed
+    with memoryview(data) as raw, raw.cast('B') as view:
+        for i in range(0, len(view), per_line):
+            # memoryview.hex() formats the whole line in C: "AA BB" -> "0xAA, 0xBB"
+            line = view[i:i+per_line].hex(' ').upper().replace(' ', ', 0x')
+            yield f"    0x{line},\n"
+
+def byte_array_lines(name, data, per_line=16):
+    """Yield a static const uint8_t C array holding data, line by line"""
+    yield f"static const uint8_t {name}[] = {{\n"
+    yield from hex_lines(data, per_line)
+    yield "};\n\n"
+
+def emit_img_dsc(cf, w, h, size, name, data_name="logo_splash_data"):
+    """Emit an LVGL lv_img_dsc_t descriptor pointing at data_name"""
+    return f"""const lv_img_dsc_t {name} = {{
+    .header = {{
+        .cf = {cf},
+        .w = {w},
+        .h = {h},
+    }},
+    .data_size = {size},
+    .data = {data_name},
+}};
+"""
+
+def indexed_format(num_colors):
+    """Return (bit_depth, LVGL color format) for a palette of num_colors"""
+    if num_colors <= 2:
+        return 1, "LV_IMG_CF_INDEXED_1BIT"
+    elif num_colors <= 4:
+        return 2, "LV_IMG_CF_INDEXED_2BIT"
+    elif num_colors <= 16:
+        return 4, "LV_IMG_CF_INDEXED_4BIT"
+    return 8, "LV_IMG_CF_INDEXED_8BIT"
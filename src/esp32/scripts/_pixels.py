@@ -0,0 +1,153 @@
+"""
+Shared NumPy image loading, RGB565 conversion and palette packing
+Used by compress_logo.py, png_to_logo.py and png_to_rgb565.py
+"""
+
+import numpy as np
+from _c_emit import indexed_format
+
+# Optional: compiled palette/packing pipeline (python setup.py build_ext --inplace)
+try:
+    import logo_build as _logo_build
+except ImportError:
+    _logo_build = None
+
+# RGB888 -> RGB565 channel lookup tables (bit patterns match rgb_to_rgb565)
+_R5 = (np.arange(256, dtype=np.uint16) >> 3) << 11
+_G6 = (np.arange(256, dtype=np.uint16) >> 2) << 5
+_B5 = np.arange(256, dtype=np.uint16) >> 3
+
+def rgb888_to_rgb565(rgb):
+    """Convert an (..., 3) uint8 RGB array to a flat row-major uint16 RGB565 array"""
+    rgb = np.asarray(rgb, dtype=np.uint8)
+    return (_R5[rgb[..., 0]] + _G6[rgb[..., 1]] + _B5[rgb[..., 2]]).ravel()
+
+def _load_rgb_cv2(cv2, png_file, target_size):
+    """OpenCV load path for load_rgb(); returns None if cv2 cannot read the file"""
+    img = cv2.imread(png_file, cv2.IMREAD_UNCHANGED)
+    if img is None:
+        return None
+    if img.ndim == 2:
+        return None  # OpenCV drops a grayscale tRNS chunk - let PIL handle it
+    if img.dtype == np.uint16:
+        img = (img >> 8).astype(np.uint8)
+
+    # Handle transparency - composite on black background (matches splash screen)
+    # IMREAD_UNCHANGED expands LA, palette and RGB tRNS alpha to BGRA
+    if img.shape[2] == 4:
+        print("Image has transparency - compositing on black background...")
+        # Same rounding as PIL's paste() with an alpha mask
+        tmp = img[..., :3].astype(np.uint16) * img[..., 3:4] + 128
+        img = ((tmp + (tmp >> 8)) >> 8).astype(np.uint8)
+
+    size = (img.shape[1], img.shape[0])
+    if size != tuple(target_size):
+        print(f"Resizing from {size} to {tuple(target_size)}...")
+        # INTER_AREA gives the cleanest edges when shrinking logos
+        shrinking = target_size[0] <= size[0] and target_size[1] <= size[1]
+        interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4
+        img = cv2.resize(img, tuple(target_size), interpolation=interpolation)
+
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+def _load_rgb_pil(png_file, target_size):
+    """PIL load path for load_rgb()"""
+    from PIL import Image
+
+    img = Image.open(png_file)
+
+    # Handle transparency - composite on black background (matches splash screen)
+    # LA/PA and tRNS (palette, grayscale, RGB) images carry alpha too
+    if img.mode in ('LA', 'PA') or 'transparency' in img.info:
+        img = img.convert('RGBA')
+    if img.mode == 'RGBA':
+        print("Image has transparency - compositing on black background...")
+        background = Image.new('RGB', img.size, (0, 0, 0))
+        background.paste(img, mask=img.split()[3])  # Use alpha channel as mask
+        img = background
+    elif img.mode != 'RGB':
+        print(f"Converting image from {img.mode} to RGB...")
+        img = img.convert('RGB')
+
+    if img.size != tuple(target_size):
+        print(f"Resizing from {img.size} to {tuple(target_size)}...")
+        # For logos with sharp edges, use LANCZOS with high-quality settings
+        # LANCZOS preserves edges better than HAMMING for graphics/logos
+        img = img.resize(target_size, Image.Resampling.LANCZOS)
+
+    return np.asarray(img)
+
+def load_rgb(png_file, target_size, use_cv2=False):
+    """Load an image as an (H, W, 3) uint8 RGB array composited on black and resized
+
+    Uses PIL (LANCZOS) by default, so the checked-in sources don't depend on
+    what is installed. use_cv2 opts into OpenCV (INTER_AREA when shrinking):
+    its pixels differ from PIL's, and at logo sizes the cv2 import costs more
+    than it saves. Grayscale images always go through PIL.
+    """
+    if use_cv2:
+        import cv2
+        rgb = _load_rgb_cv2(cv2, png_file, target_size)
+        if rgb is not None:
+            return rgb
+    return _load_rgb_pil(png_file, target_size)
+
+def build_rgb565_to_index_lut(unique_colors):
+    """Build a 65536-entry RGB565 -> palette index table (0xFF = not in palette)
+
+    lut[colors] maps a whole frame in one table gather; the 64KB table can be
+    reused across frames that share the palette (e.g. animated splash).
+    """
+    unique_colors = np.asarray(unique_colors, dtype=np.uint16)
+    if unique_colors.size > 256:
+        raise ValueError(f"palette has {unique_colors.size} colors, max 256")
+    lut = np.full(65536, 0xFF, dtype=np.uint8)
+    lut[unique_colors] = np.arange(unique_colors.size, dtype=np.uint8)
+    return lut
+
+def pack_indices(indices, bit_depth):
+    """Pack palette indices MSB-first into bytes (1/2/4/8 bits per pixel)"""
+    indices = np.ascontiguousarray(indices, dtype=np.uint8)
+    if bit_depth == 8:
+        return indices
+
+    if bit_depth == 1:
+        # packbits pads the final byte with zeros
+        return np.packbits(indices)
+
+    # Pad to a whole number of bytes, then one row per output byte
+    per_byte = 8 // bit_depth
+    pad = -len(indices) % per_byte
+    if pad:
+        indices = np.concatenate([indices, np.zeros(pad, dtype=np.uint8)])
+    windows = indices.reshape(-1, per_byte)
+
+    # Each pixel lands in its own bit field (MSB first, e.g. shifts 6,4,2,0),
+    # so the weighted sum equals the OR - one branchless pass, never > 255
+    shifts = np.arange(8 - bit_depth, -1, -bit_depth)
+    weights = (1 << shifts).astype(np.uint8)
+    return windows @ weights
+
+def _build_logo_numpy(colors):
+    """NumPy fallback for build_logo()"""
+    unique_colors = np.unique(colors)
+    if unique_colors.size > 256:
+        return unique_colors, None, None
+    indices = build_rgb565_to_index_lut(unique_colors)[colors]
+    bit_depth, _ = indexed_format(unique_colors.size)
+    blob = unique_colors.astype('<u2').tobytes() + pack_indices(indices, bit_depth).tobytes()
+    return unique_colors, indices, blob
+
+def build_logo(colors):
+    """Build (palette, indices, blob) for a flat RGB565 pixel array
+
+    palette is the sorted uint16 color table, indices the per-pixel palette
+    index and blob the LVGL indexed image data: little-endian palette followed
+    by indices packed at indexed_format()'s bit depth. indices and blob are
+    None when there are more than 256 colors. Uses the compiled logo_build
+    extension when it has been built, NumPy otherwise.
+    """
+    colors = np.ascontiguousarray(colors, dtype=np.uint16).ravel()
+    if _logo_build is not None:
+        return _logo_build.build_logo(colors)
+    return _build_logo_numpy(colors)
@@ -6,19 +6,24 @@ Reduces flash usage from 64KB to ~8-16KB for logos with few colors
 
 import sys
 import os
+import re
+import numpy as np
+from _c_emit import (byte_array_lines, emit_img_dsc, indexed_format, map_readonly,
+                     open_output, write_bin)
+from _pixels import build_logo
 
-def convert_to_indexed(input_file, output_file):
-    """Convert RGB565 logo to indexed color format"""
-    
-    # Read the current logo file
-    with open(input_file, 'r') as f:
-        content = f.read()
+# Hex literal in the C array; '//' comments match too (empty group) so their
+# contents are never mistaken for pixels
+HEX_RE = re.compile(rb'//[^\n]*|0x([0-9A-Fa-f]+)')
+
+def parse_rgb565_array(content, input_file):
+    """Parse the uint16_t logo_splash_data array in content (bytes/mmap), or None"""
     
     # Extract the data array - try different formats
     array_patterns = [
-        'static const uint16_t logo_splash_data[] = {',
-        'static const uint16_t logo_splash_data[]',
-        'const uint16_t logo_splash_data[] = {',
+        b'static const uint16_t logo_splash_data[] = {',
+        b'static const uint16_t logo_splash_data[]',
+        b'const uint16_t logo_splash_data[] = {',
     ]
     
     start_idx = -1
@@ -29,47 +34,43 @@ def convert_to_indexed(input_file, output_file):
     
     if start_idx == -1:
         print(f"Error: Could not find logo_splash_data array in {input_file}")
-        print("Looking for patterns:", array_patterns)
-        return False
+        print("Looking for patterns:", [pattern.decode() for pattern in array_patterns])
+        return None
     
     # Find the array end
-    end_idx = content.find('};', start_idx)
+    end_idx = content.find(b'};', start_idx)
     if end_idx == -1:
         print("Error: Could not find array end")
-        return False
+        return None
+    
+    # Parse all color values (0xXXXX) in one regex scan of the array body
+    array_start = content.find(b'{', start_idx) + 1
+    hex_vals = [h for h in HEX_RE.findall(content, array_start, end_idx) if h]
+    if any(len(h) > 4 for h in hex_vals):
+        print("Error: Array contains values wider than 16 bits")
+        return None
+    hex_str = b''.join(h.zfill(4) for h in hex_vals).decode('ascii')
+    return np.frombuffer(bytes.fromhex(hex_str), dtype='>u2').astype(np.uint16)
+
+def convert_to_indexed(input_file, output_file, file=None, bin_file=None):
+    """Convert RGB565 logo to indexed color format (written to file if given)
+    
+    If bin_file is given, the raw palette + indices blob is also written there.
+    """
     
-    # Extract array content
-    array_start = content.find('{', start_idx) + 1
-    array_content = content[array_start:end_idx]
-    
-    # Parse all color values
-    colors = []
-    for line in array_content.split('\n'):
-        line = line.strip()
-        if not line or line.startswith('//'):
-            continue
-        # Remove trailing comma
-        line = line.rstrip(',')
-        # Split by comma and parse hex values
-        for val in line.split(','):
-            val = val.strip()
-            if val:
-                try:
-                    # Handle hex format (0xXXXX)
-                    if val.startswith('0x'):
-                        color = int(val, 16)
-                    else:
-                        color = int(val)
-                    colors.append(color)
-                except ValueError:
-                    continue
+    # Map the logo file read-only and parse it before writing anything,
+    # since input and output are usually the same file
+    with open(input_file, 'rb') as f, map_readonly(f) as content:
+        colors = parse_rgb565_array(content, input_file)
+    if colors is None:
+        return False
     
     print(f"Found {len(colors)} pixels")
     print(f"Original size: {len(colors) * 2} bytes ({len(colors) * 2 / 1024:.1f} KB)")
     
-    # Build color palette (find unique colors)
-    unique_colors = list(set(colors))
-    num_colors = len(unique_colors)
+    # Build sorted color palette and the packed data blob (palette + indices)
+    unique_colors, _, blob = build_logo(colors)
+    num_colors = unique_colors.size
     
     print(f"Unique colors: {num_colors}")
     
@@ -79,37 +80,13 @@ def convert_to_indexed(input_file, output_file):
         return False
     
     # Determine bit depth needed
-    if num_colors <= 2:
-        bit_depth = 1
-        cf_format = "LV_IMG_CF_INDEXED_1BIT"
-    elif num_colors <= 4:
-        bit_depth = 2
-        cf_format = "LV_IMG_CF_INDEXED_2BIT"
-    elif num_colors <= 16:
-        bit_depth = 4
-        cf_format = "LV_IMG_CF_INDEXED_4BIT"
-    else:
-        bit_depth = 8
-        cf_format = "LV_IMG_CF_INDEXED_8BIT"
-    
-    # Create color palette (map color -> index)
-    palette = {color: idx for idx, color in enumerate(unique_colors)}
-    
-    # Convert pixels to indices
-    indices = [palette[color] for color in colors]
-    
-    # Calculate compressed size
-    palette_size = len(unique_colors) * 2  # Each color is 2 bytes (RGB565)
-    if bit_depth == 1:
-        indices_size = (len(indices) + 7) // 8  # 1 bit per pixel
-    elif bit_depth == 2:
-        indices_size = (len(indices) + 3) // 4  # 2 bits per pixel
-    elif bit_depth == 4:
-        indices_size = (len(indices) + 1) // 2  # 4 bits per pixel
-    else:  # 8 bit
-        indices_size = len(indices)  # 1 byte per pixel
-    
-    total_size = palette_size + indices_size
+    bit_depth, cf_format = indexed_format(num_colors)
+    
+    # Calculate compressed size - blob holds exactly the bytes LVGL reads
+    # (little-endian palette + packed indices), so data_size matches the array
+    indices_size = len(blob) - num_colors * 2
+    
+    total_size = len(blob)
     compression_ratio = (len(colors) * 2) / total_size
     
     print(f"Compressed size: {total_size} bytes ({total_size / 1024:.1f} KB)")
@@ -118,7 +95,7 @@ def convert_to_indexed(input_file, output_file):
     
     # Generate new C file
     # LVGL indexed format: data array contains palette (uint16_t) followed by indices (packed)
-    output = f"""// Auto-generated logo image for splash screen (COMPRESSED)
+    header = f"""// Auto-generated logo image for splash screen (COMPRESSED)
 // Generated from logo-vert.png
 // Compressed using indexed color format ({num_colors} colors, {bit_depth}-bit indices)
 // Format: palette ({num_colors} * 2 bytes) + indices ({indices_size} bytes) = {total_size} bytes
@@ -127,72 +104,20 @@ def convert_to_indexed(input_file, output_file):
 #define LOGO_SPLASH_WIDTH 180
 #define LOGO_SPLASH_HEIGHT 180
 
-// Combined data: palette (uint16_t colors) + packed indices
-static const uint8_t logo_splash_data[] = {{
-    // Palette: {num_colors} colors as little-endian uint16_t
+// Combined data: palette (uint16_t colors, little-endian) + packed indices
 """
     
-    # Write palette as bytes (little-endian for RGB565)
-    for i in range(0, len(unique_colors), 4):
-        colors_line = unique_colors[i:i+4]
-        palette_bytes = []
-        for color in colors_line:
-            palette_bytes.append(f"0x{color & 0xFF:02X}")
-            palette_bytes.append(f"0x{(color >> 8) & 0xFF:02X}")
-        output += f"    {', '.join(palette_bytes)},\n"
-    
-    output += f"    // Indices: {len(indices)} pixels packed as {bit_depth}-bit values\n"
-    
-    # Write indices
-    if bit_depth == 1:
-        # Pack 8 pixels per byte
-        for i in range(0, len(indices), 8):
-            byte = 0
-            for j in range(8):
-                if i + j < len(indices):
-                    byte |= (indices[i + j] & 0x01) << (7 - j)
-            output += f"    0x{byte:02X},\n"
-    elif bit_depth == 2:
-        # Pack 4 pixels per byte
-        for i in range(0, len(indices), 4):
-            byte = 0
-            for j in range(4):
-                if i + j < len(indices):
-                    byte |= (indices[i + j] & 0x03) << (6 - j * 2)
-            output += f"    0x{byte:02X},\n"
-    elif bit_depth == 4:
-        # Pack 2 pixels per byte
-        for i in range(0, len(indices), 2):
-            byte = 0
-            if i < len(indices):
-                byte |= (indices[i] & 0x0F) << 4
-            if i + 1 < len(indices):
-                byte |= indices[i + 1] & 0x0F
-            output += f"    0x{byte:02X},\n"
-    else:  # 8 bit
-        # 1 pixel per byte
-        for i in range(0, len(indices), 16):
-            indices_line = indices[i:i+16]
-            indices_str = ', '.join(f'0x{idx:02X}' for idx in indices_line)
-            output += f"    {indices_str},\n"
-    
-    output += "};\n\n"
-    
-    # Write image descriptor
-    output += f"""const lv_img_dsc_t logo_splash_img = {{
-    .header = {{
-        .cf = {cf_format},
-        .w = 180,
-        .h = 180,
-    }},
-    .data_size = {total_size},
-    .data = logo_splash_data,
-}};
-"""
+    descriptor = emit_img_dsc(cf_format, 180, 180, total_size, "logo_splash_img")
+    
+    # Write output file segment by segment
+    with open_output(output_file, file) as out:
+        out.write(header)
+        out.writelines(byte_array_lines("logo_splash_data", blob))
+        out.write(descriptor)
     
-    # Write output file
-    with open(output_file, 'w') as f:
-        f.write(output)
+    if bin_file is not None:
+        write_bin(bin_file, blob)
+        print(f"Raw image data written to: {bin_file}")
     
     print(f"\nCompressed logo written to: {output_file}")
     return True
@@ -202,10 +127,15 @@ if __name__ == '__main__':
     input_file = os.path.join(script_dir, '../src/ui/logo_splash.c')
     output_file = os.path.join(script_dir, '../src/ui/logo_splash.c')
     
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
+    # --bin also writes the raw data blob next to the C file (<output>.bin)
+    write_raw = '--bin' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--bin']
+    
+    if len(args) > 0:
+        input_file = args[0]
+    if len(args) > 1:
+        output_file = args[1]
+    bin_file = os.path.splitext(output_file)[0] + '.bin' if write_raw else None
     
     # Backup original
     backup_file = output_file + '.backup'
@@ -214,7 +144,7 @@ if __name__ == '__main__':
         shutil.copy2(output_file, backup_file)
         print(f"Backed up original to: {backup_file}")
     
-    if convert_to_indexed(input_file, output_file):
+    if convert_to_indexed(input_file, output_file, bin_file=bin_file):
         print("\n✓ Compression complete!")
         print("Note: You may need to adjust the image descriptor if LVGL format differs")
     else:
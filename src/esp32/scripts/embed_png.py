@@ -6,78 +6,86 @@ LVGL supports PNG natively, so we can use the compressed PNG file as-is
 
 import sys
 import os
+import struct
+import zlib
+from _c_emit import (byte_array_lines, emit_img_dsc, is_up_to_date, map_readonly,
+                     open_output, stamp_key, write_stamp)
 
-def embed_png(png_file, output_file):
-    """Embed PNG file as binary C array"""
+# Bump when the generated output changes, so stale .stamp files are ignored
+CONVERTER = "embed_png/1"
+
+def embed_png(png_file, output_file, file=None, force=False):
+    """Embed PNG file as binary C array (written to file if given)
+    
+    Skips the conversion when output_file was already generated from the same
+    PNG and settings (see the .stamp file next to it), unless force is set.
+    """
     
     if not os.path.exists(png_file):
         print(f"Error: PNG file not found: {png_file}")
         return False
     
-    # Read PNG file
-    with open(png_file, 'rb') as f:
-        png_data = f.read()
+    # Skip regeneration if the PNG and settings match the last run
+    stamp = stamp_key(png_file, CONVERTER)
+    if file is None and not force and is_up_to_date(output_file, stamp):
+        print(f"{output_file} is up to date ({os.path.basename(png_file)} unchanged)")
+        return True
     
-    file_size = len(png_data)
-    print(f"Embedding PNG: {png_file}")
-    print(f"File size: {file_size} bytes ({file_size / 1024:.1f} KB)")
-    
-    # Parse PNG dimensions from IHDR chunk (bytes 16-24)
-    # PNG signature: 8 bytes, then IHDR chunk starts at byte 8
-    # Width is bytes 16-19, Height is bytes 20-23 (big-endian)
-    if len(png_data) >= 24:
-        width = (png_data[16] << 24) | (png_data[17] << 16) | (png_data[18] << 8) | png_data[19]
-        height = (png_data[20] << 24) | (png_data[21] << 16) | (png_data[22] << 8) | png_data[23]
-        print(f"PNG dimensions: {width}x{height}")
-    else:
-        width = 0
-        height = 0
-        print("Warning: Could not parse PNG dimensions")
-    
-    # Generate C file with embedded PNG data
-    output = f"""// Auto-generated logo image for splash screen (EMBEDDED PNG)
+    # Map the PNG read-only instead of copying it into memory
+    with open(png_file, 'rb') as f, map_readonly(f) as png_data:
+        file_size = len(png_data)
+        print(f"Embedding PNG: {png_file}")
+        print(f"File size: {file_size} bytes ({file_size / 1024:.1f} KB)")
+        
+        # Parse PNG dimensions from IHDR chunk (bytes 16-24)
+        # PNG signature: 8 bytes, then IHDR chunk starts at byte 8
+        # Width is bytes 16-19, Height is bytes 20-23 (big-endian)
+        if len(png_data) >= 24:
+            width, height = struct.unpack_from(">II", png_data, 16)
+            print(f"PNG dimensions: {width}x{height}")
+        else:
+            width = 0
+            height = 0
+            print("Warning: Could not parse PNG dimensions")
+        
+        # Validate IHDR CRC (covers chunk type + 13 data bytes, stored at bytes 29-32)
+        if len(png_data) >= 33 and png_data[12:16] == b'IHDR':
+            (ihdr_crc,) = struct.unpack_from(">I", png_data, 29)
+            if zlib.crc32(png_data[12:29]) != ihdr_crc:
+                print("Warning: PNG IHDR CRC mismatch - file may be corrupt")
+        else:
+            print("Warning: PNG IHDR chunk not found - file may not be a PNG")
+        
+        # Generate C file with embedded PNG data
+        header = f"""// Auto-generated logo image for splash screen (EMBEDDED PNG)
 // Generated from {os.path.basename(png_file)}
 // LVGL supports PNG natively - no conversion needed!
 // File size: {file_size} bytes ({file_size / 1024:.1f} KB)
 #include <lvgl.h>
 
 // Embedded PNG data
-static const uint8_t logo_splash_data[] = {{
 """
+        
+        # LVGL 8.x supports PNG through extra/libs/png
+        # Use LV_IMG_CF_RAW - LVGL will decode PNG if decoder is enabled
+        descriptor = emit_img_dsc("LV_IMG_CF_RAW", width, height, file_size, "logo_splash_img")
+        
+        # Backup existing file
+        if file is None and os.path.exists(output_file):
+            backup_file = output_file + '.backup'
+            if not os.path.exists(backup_file):
+                import shutil
+                shutil.copy2(output_file, backup_file)
+                print(f"Backed up original to: {backup_file}")
+        
+        # Write output file, streaming the hex dump line by line
+        with open_output(output_file, file) as out:
+            out.write(header)
+            out.writelines(byte_array_lines("logo_splash_data", png_data))
+            out.write(descriptor)
     
-    # Write binary data as hex bytes (16 bytes per line for readability)
-    for i in range(0, file_size, 16):
-        chunk = png_data[i:i+16]
-        hex_bytes = ', '.join(f'0x{b:02X}' for b in chunk)
-        output += f"    {hex_bytes},\n"
-    
-    output += "};\n\n"
-    
-    # Create LVGL image descriptor
-    # LVGL 8.x supports PNG through extra/libs/png
-    # Use LV_IMG_CF_RAW - LVGL will decode PNG if decoder is enabled
-    output += f"""const lv_img_dsc_t logo_splash_img = {{
-    .header = {{
-        .cf = LV_IMG_CF_RAW,  // LVGL will decode PNG if PNG decoder is enabled
-        .w = {width},
-        .h = {height},
-    }},
-    .data_size = {file_size},
-    .data = logo_splash_data,
-}};
-"""
-    
-    # Backup existing file
-    if os.path.exists(output_file):
-        backup_file = output_file + '.backup'
-        if not os.path.exists(backup_file):
-            import shutil
-            shutil.copy2(output_file, backup_file)
-            print(f"Backed up original to: {backup_file}")
-    
-    # Write output file
-    with open(output_file, 'w') as f:
-        f.write(output)
+    if file is None:
+        write_stamp(output_file, stamp)
     
     print(f"\n✓ PNG embedded to: {output_file}")
     print(f"  LVGL will automatically decode the PNG format")
@@ -86,18 +94,22 @@ static const uint8_t logo_splash_data[] = {{
 if __name__ == '__main__':
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
-    if len(sys.argv) < 2:
+    # --force regenerates even if the output's .stamp says it is up to date
+    force = '--force' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--force']
+    
+    if len(args) < 1:
         # Default: use the PNG from assets
         png_file = os.path.join(script_dir, '../../../assets/sizes/app-icon/vertical/white/small.png')
         output_file = os.path.join(script_dir, '../src/ui/logo_splash.c')
     else:
-        png_file = sys.argv[1]
-        if len(sys.argv) > 2:
-            output_file = sys.argv[2]
+        png_file = args[0]
+        if len(args) > 1:
+            output_file = args[1]
         else:
             output_file = os.path.join(script_dir, '../src/ui/logo_splash.c')
     
-    if embed_png(png_file, output_file):
+    if embed_png(png_file, output_file, force=force):
         print("\n✓ Embedding complete!")
     else:
         print("\n✗ Embedding failed")
@@ -0,0 +1,69 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Compiled palette + index packing for _pixels.build_logo()
+Build with: python setup.py build_ext --inplace (from this directory)
+"""
+
+import numpy as np
+from libc.stdint cimport uint8_t, uint16_t
+
+def build_logo(const uint16_t[::1] colors):
+    """(palette, indices, blob) for flat RGB565 pixels - see _pixels.build_logo()"""
+    cdef Py_ssize_t n = colors.shape[0]
+    cdef Py_ssize_t i, o, num_colors = 0
+    cdef int v, j, bit_depth, per_byte
+    cdef uint8_t byte
+
+    # Mark present colors, then walk the table once: a sorted palette
+    # and the RGB565 -> index LUT without any sort or search
+    seen_arr = np.zeros(65536, dtype=np.uint8)
+    palette_arr = np.empty(65536, dtype=np.uint16)
+    lut_arr = np.full(65536, 0xFF, dtype=np.uint8)
+    cdef uint8_t[::1] seen = seen_arr
+    cdef uint16_t[::1] palette = palette_arr
+    cdef uint8_t[::1] lut = lut_arr
+    with nogil:
+        for i in range(n):
+            seen[colors[i]] = 1
+        for v in range(65536):
+            if seen[v]:
+                if num_colors < 256:
+                    lut[v] = <uint8_t>num_colors
+                palette[num_colors] = <uint16_t>v
+                num_colors += 1
+
+    if num_colors > 256:
+        return palette_arr[:num_colors].copy(), None, None
+
+    if num_colors <= 2:
+        bit_depth = 1
+    elif num_colors <= 4:
+        bit_depth = 2
+    elif num_colors <= 16:
+        bit_depth = 4
+    else:
+        bit_depth = 8
+    per_byte = 8 // bit_depth
+
+    indices_arr = np.empty(n, dtype=np.uint8)
+    blob_arr = np.empty(num_colors * 2 + (n + per_byte - 1) // per_byte, dtype=np.uint8)
+    cdef uint8_t[::1] indices = indices_arr
+    cdef uint8_t[::1] blob = blob_arr
+    cdef Py_ssize_t packed_start = num_colors * 2
+    with nogil:
+        # Palette as little-endian uint16 regardless of host byte order
+        for i in range(num_colors):
+            blob[2 * i] = palette[i] & 0xFF
+            blob[2 * i + 1] = palette[i] >> 8
+        for i in range(n):
+            indices[i] = lut[colors[i]]
+        # Pack MSB-first, zero-padding the final byte
+        for o in range(blob.shape[0] - packed_start):
+            byte = 0
+            for j in range(per_byte):
+                i = o * per_byte + j
+                if i < n:
+                    byte |= indices[i] << (8 - bit_depth * (j + 1))
+            blob[packed_start + o] = byte
+
+    return palette_arr[:num_colors].copy(), indices_arr, blob_arr.tobytes()
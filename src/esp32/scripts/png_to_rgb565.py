@@ -6,64 +6,63 @@ Simple, reliable format that definitely works
 
 import sys
 import os
-from PIL import Image
+import importlib.util
+from _c_emit import (byte_array_lines, emit_img_dsc, is_up_to_date, open_output,
+                     stamp_key, write_stamp)
+
+# Bump when the generated output changes, so stale .stamp files are ignored
+CONVERTER = "png_to_rgb565/1"
 
 def rgb_to_rgb565(r, g, b):
     """Convert RGB888 to RGB565"""
     return ((r >> 3) << 11) | ((g >> 2) << 5) | (b >> 3)
 
-def convert_png_to_rgb565(png_file, output_file, target_size=(180, 180)):
-    """Convert PNG to RGB565 TRUE_COLOR format"""
+def convert_png_to_rgb565(png_file, output_file, target_size=(180, 180), file=None, force=False,
+                          use_cv2=False):
+    """Convert PNG to RGB565 TRUE_COLOR format (written to file if given)
+    
+    Skips the conversion when output_file was already generated from the same
+    PNG and settings (see the .stamp file next to it), unless force is set.
+    use_cv2 loads the PNG with OpenCV instead of PIL (output pixels differ).
+    """
     
     if not os.path.exists(png_file):
         print(f"Error: PNG file not found: {png_file}")
         return False
     
+    if use_cv2 and importlib.util.find_spec('cv2') is None:
+        print("Error: --cv2 requires OpenCV (pip install opencv-python-headless)")
+        return False
+    
+    # Skip regeneration if the PNG and settings match the last run
+    stamp = stamp_key(png_file, CONVERTER, target_size, 'cv2' if use_cv2 else 'pil')
+    if file is None and not force and is_up_to_date(output_file, stamp):
+        print(f"{output_file} is up to date ({os.path.basename(png_file)} unchanged)")
+        return True
+    
+    # Imported past the up-to-date check so a skipped run doesn't pay for NumPy
+    import numpy as np
+    from _pixels import load_rgb, rgb888_to_rgb565
+    
     print(f"Loading PNG: {png_file}")
     
-    # Load image
-    img = Image.open(png_file)
-    
-    # Handle transparency - composite on black background (matches splash screen)
-    if img.mode == 'RGBA':
-        print("Image has transparency - compositing on black background...")
-        background = Image.new('RGB', img.size, (0, 0, 0))
-        background.paste(img, mask=img.split()[3])  # Use alpha channel as mask
-        img = background
-    elif img.mode != 'RGB':
-        print(f"Converting image from {img.mode} to RGB...")
-        img = img.convert('RGB')
-    
-    # Resize if needed
-    if img.size != target_size:
-        print(f"Resizing from {img.size} to {target_size}...")
-        img = img.resize(target_size, Image.Resampling.LANCZOS)
-    
-    width, height = img.size
+    # Load, composite on black (matches splash screen) and resize
+    rgb = load_rgb(png_file, target_size, use_cv2)
+    height, width = rgb.shape[:2]
     print(f"Image size: {width}x{height} pixels")
     
-    # Convert to RGB565
-    colors = []
-    pixels = img.load()
-    white_count = 0
-    black_count = 0
-    for y in range(height):
-        for x in range(width):
-            r, g, b = pixels[x, y]
-            rgb565 = rgb_to_rgb565(r, g, b)
-            colors.append(rgb565)
-            if rgb565 == 0xFFFF:
-                white_count += 1
-            elif rgb565 == 0x0000:
-                black_count += 1
+    # Convert to RGB565 (table lookup over the whole image, row-major)
+    colors = rgb888_to_rgb565(rgb)
+    white_count = np.count_nonzero(colors == 0xFFFF)
+    black_count = np.count_nonzero(colors == 0x0000)
     
     total_size = len(colors) * 2  # 2 bytes per pixel
     print(f"RGB565 size: {total_size} bytes ({total_size / 1024:.1f} KB)")
     print(f"White pixels: {white_count}, Black pixels: {black_count}")
-    print(f"Sample center colors: {colors[width*height//2 - 5:width*height//2 + 5]}")
+    print(f"Sample center colors: {colors[width*height//2 - 5:width*height//2 + 5].tolist()}")
     
     # Generate C file
-    output = f"""// Auto-generated logo image for splash screen (RGB565)
+    header = f"""// Auto-generated logo image for splash screen (RGB565)
 // Generated from {os.path.basename(png_file)}
 // Format: RGB565 TRUE_COLOR (2 bytes per pixel)
 // Size: {total_size} bytes ({total_size / 1024:.1f} KB)
@@ -73,43 +72,25 @@ def convert_png_to_rgb565(png_file, output_file, target_size=(180, 180)):
 #define LOGO_SPLASH_HEIGHT {height}
 
 // RGB565 pixel data (little-endian)
-static const uint8_t logo_splash_data[] = {{
-"""
-    
-    # Write RGB565 colors as bytes (little-endian)
-    for i in range(0, len(colors), 8):
-        colors_line = colors[i:i+8]
-        color_bytes = []
-        for color in colors_line:
-            color_bytes.append(f"0x{color & 0xFF:02X}")
-            color_bytes.append(f"0x{(color >> 8) & 0xFF:02X}")
-        output += f"    {', '.join(color_bytes)},\n"
-    
-    output += "};\n\n"
-    
-    # Write image descriptor
-    output += f"""const lv_img_dsc_t logo_splash_img = {{
-    .header = {{
-        .cf = LV_IMG_CF_TRUE_COLOR,
-        .w = {width},
-        .h = {height},
-    }},
-    .data_size = {total_size},
-    .data = logo_splash_data,
-}};
 """
+    descriptor = emit_img_dsc("LV_IMG_CF_TRUE_COLOR", width, height, total_size, "logo_splash_img")
     
     # Backup existing file
-    if os.path.exists(output_file):
+    if file is None and os.path.exists(output_file):
         backup_file = output_file + '.backup'
         if not os.path.exists(backup_file):
             import shutil
             shutil.copy2(output_file, backup_file)
             print(f"Backed up original to: {backup_file}")
     
-    # Write output file
-    with open(output_file, 'w') as f:
-        f.write(output)
+    # Write output file segment by segment
+    with open_output(output_file, file) as out:
+        out.write(header)
+        out.writelines(byte_array_lines("logo_splash_data", colors.astype('<u2').tobytes()))
+        out.write(descriptor)
+    
+    if file is None:
+        write_stamp(output_file, stamp)
     
     print(f"\n✓ RGB565 logo written to: {output_file}")
     return True
@@ -117,17 +98,23 @@ static const uint8_t logo_splash_data[] = {{
 if __name__ == '__main__':
     script_dir = os.path.dirname(os.path.abspath(__file__))
     
-    if len(sys.argv) < 2:
+    # --force regenerates even if the output's .stamp says it is up to date
+    force = '--force' in sys.argv[1:]
+    # --cv2 loads the PNG with OpenCV instead of PIL (different resampler)
+    use_cv2 = '--cv2' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg not in ('--force', '--cv2')]
+    
+    if len(args) < 1:
         png_file = os.path.join(script_dir, '../../../assets/sizes/app-icon/vertical/white/small.png')
         output_file = os.path.join(script_dir, '../src/ui/logo_splash.c')
     else:
-        png_file = sys.argv[1]
-        if len(sys.argv) > 2:
-            output_file = sys.argv[2]
+        png_file = args[0]
+        if len(args) > 1:
+            output_file = args[1]
         else:
             output_file = os.path.join(script_dir, '../src/ui/logo_splash.c')
     
-    if convert_png_to_rgb565(png_file, output_file):
+    if convert_png_to_rgb565(png_file, output_file, force=force, use_cv2=use_cv2):
         print("\n✓ Conversion complete!")
     else:
         print("\n✗ Conversion failed")
@@ -0,0 +1,13 @@
+"""
+Optional: build the logo_build Cython extension used by _pixels.build_logo()
+Usage: python setup.py build_ext --inplace
+Without it the logo scripts fall back to the NumPy implementation.
+"""
+
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+setup(
+    name="logo_build",
+    ext_modules=cythonize([Extension("logo_build", ["logo_build.pyx"])]),
+)